@@ -2,123 +2,373 @@ import pandas as pd
 import numpy as np
 import statsmodels.api as sm
 from statsmodels.tsa.stattools import adfuller
-import sqlite3
+from math import sqrt
+from numba import njit, float64, int64, types
 
-def load_data(db_path, symbols, max_rows=500000):
+# Row layout of a tick as read from the `ticks` table
+TICK_DTYPE = np.dtype([('timestamp', 'i8'), ('price', 'f8'), ('size', 'f8')])
+# Row layout of a bar as aggregated by load_bars
+BAR_DTYPE = np.dtype([
+    ('timestamp', 'i8'), ('open', 'f8'), ('high', 'f8'), ('low', 'f8'),
+    ('close', 'f8'), ('volume', 'f8'), ('last_ts', 'i8')
+])
+
+def load_new_data(conn, sym, since_ts, limit):
     """
-    Loads tick data from SQLite into a dictionary of pandas DataFrames.
-    Loads only the most recent `max_rows` to keep memory usage low.
+    Loads the ticks for `sym` newer than `since_ts` (epoch ms), oldest first.
+    Used to top up already-loaded bars instead of re-reading everything.
+    At most the newest `limit` ticks are returned; getting exactly `limit`
+    back means older ones may have been cut off.
     """
-    data = {}
-    try:
-        conn = sqlite3.connect(db_path)
-        conn.execute("PRAGMA journal_mode=WAL;")
-        for sym in symbols:
-            # Query for the most recent N rows for the specific symbol
-            query = f"""
-            SELECT * FROM (
-                SELECT timestamp, price, size
-                FROM ticks
-                WHERE symbol = '{sym}'
-                ORDER BY timestamp DESC
-                LIMIT {max_rows}
-            )
-            ORDER BY timestamp ASC;
-            """
-            df = pd.read_sql_query(query, conn)
-            
-            if not df.empty:
-                # Convert timestamp (ms) to datetime and set as index
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                df = df.set_index('timestamp')
-                data[sym] = df
-            else:
-                data[sym] = pd.DataFrame(columns=['price', 'size']) # Empty df
-                
-    except Exception as e:
-        print(f"Error loading data: {e}")
-    finally:
-        if conn:
-            conn.close()
-    return data
+    query = """
+    SELECT timestamp, price, size
+    FROM ticks
+    WHERE symbol = ? AND timestamp > ?
+    ORDER BY timestamp DESC
+    LIMIT ?
+    """
+    return np.fromiter(conn.execute(query, (sym, since_ts, limit)), dtype=TICK_DTYPE)[::-1]
+
+# Bar sizes (ms) for the dashboard's timeframes
+RULE_MS = {'1s': 1000, '30s': 30000, '1min': 60000, '5min': 300000}
 
-def resample_data(tick_df, rule='1Min'):
+def rule_to_ms(rule):
+    """
+    Converts a resampling rule string (e.g. '1min') to a bar size in ms.
+    """
+    rule_ms = RULE_MS.get(rule.lower())
+    if rule_ms is None:
+        rule_ms = int(pd.Timedelta(rule).total_seconds() * 1000)
+    return rule_ms
+
+def resample_data(ts_ms, price, size, rule='1Min'):
     """
     Resamples tick data into OHLCV bars for a given timeframe. [cite: 14]
+    Expects ticks sorted by `ts_ms` (epoch ms). Buckets are computed by
+    integer division and reduced in a single pass; empty bars are skipped.
     """
-    if tick_df.empty:
+    if len(ts_ms) == 0:
         return pd.DataFrame()
-        
-    # Resample price to OHLC
-    ohlc = tick_df['price'].resample(rule).ohlc()
-    # Resample size to Volume (sum)
-    volume = tick_df['size'].resample(rule).sum().rename('volume')
-    
-    # Combine and return
-    resampled_df = ohlc.join(volume, how='outer')
-    return resampled_df
 
-def compute_ols_hedge_ratio(df1, df2):
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    price = np.asarray(price, dtype=np.float64)
+    size = np.asarray(size, dtype=np.float64)
+    rule_ms = rule_to_ms(rule)
+
+    bar_ts, o, h, l, c, v = _ohlcv_reduce_numba(ts_ms, price, size, rule_ms)
+    return _bars_df(bar_ts, o, h, l, c, v)
+
+def load_bars(conn, sym, rule='1Min', max_rows=500000):
     """
-    Calculates the hedge ratio between two price series using OLS.
+    Aggregates the most recent `max_rows` ticks of `sym` into OHLCV bars
+    inside SQLite, so individual ticks never reach Python.
+    Returns (bars, ts of the newest tick read); bars match resample_data.
     """
-    # Ensure data is aligned by index (timestamp)
-    aligned_df = df1.join(df2, how='inner', lsuffix='_1', rsuffix='_2')
+    # High/low/volume are plain aggregates per bucket. Open/close are the
+    # prices at each bucket's first/last timestamp, looked up through the
+    # (timestamp, symbol) primary key, which avoids sorting every row.
+    query = """
+    WITH recent AS (
+        SELECT timestamp, price, size
+        FROM ticks
+        WHERE symbol = :sym
+        ORDER BY timestamp DESC
+        LIMIT :max_rows
+    ),
+    agg AS (
+        SELECT timestamp / :rule_ms AS bucket,
+               min(timestamp) AS first_ts,
+               max(timestamp) AS last_ts,
+               max(price) AS h,
+               min(price) AS l,
+               sum(size) AS v
+        FROM recent
+        GROUP BY bucket
+    )
+    SELECT agg.bucket * :rule_ms, o.price, agg.h, agg.l, c.price, agg.v, agg.last_ts
+    FROM agg
+    JOIN ticks o ON o.timestamp = agg.first_ts AND o.symbol = :sym
+    JOIN ticks c ON c.timestamp = agg.last_ts AND c.symbol = :sym
+    ORDER BY agg.bucket
+    """
+    params = {'sym': sym, 'max_rows': max_rows, 'rule_ms': rule_to_ms(rule)}
+    arr = np.fromiter(conn.execute(query, params), dtype=BAR_DTYPE)
 
-    # --- ADD THIS LINE TO FIX THE ERROR ---
-    # Drop any rows where 'close' price is NaN for either symbol
-    aligned_df = aligned_df.dropna(subset=['close_1', 'close_2'])
-    
-    if aligned_df.empty or len(aligned_df) < 2:
+    if len(arr) == 0:
+        return pd.DataFrame(), -1
+
+    bars = _bars_df(arr['timestamp'], arr['open'], arr['high'], arr['low'], arr['close'], arr['volume'])
+    return bars, int(arr['last_ts'][-1])
+
+def append_bars(bars, new_bars):
+    """
+    Appends `new_bars` to `bars`. If the first new bar has the same start
+    time as the last existing one (the bar was still open), the two are merged.
+    """
+    if bars.empty:
+        return new_bars
+    if new_bars.empty:
+        return bars
+
+    if new_bars.index[0] == bars.index[-1]:
+        last = bars.iloc[-1]
+        first = new_bars.iloc[0]
+        merged = pd.DataFrame(
+            {
+                'open': [last['open']],
+                'high': [max(last['high'], first['high'])],
+                'low': [min(last['low'], first['low'])],
+                'close': [first['close']],
+                'volume': [last['volume'] + first['volume']],
+            },
+            index=new_bars.index[:1]
+        )
+        return pd.concat([bars.iloc[:-1], merged, new_bars.iloc[1:]])
+
+    return pd.concat([bars, new_bars])
+
+def _bars_df(bar_ts, o, h, l, c, v):
+    """
+    Builds the OHLCV bar DataFrame from arrays. The index is the bar start
+    time as int64 epoch ms; convert to datetimes only when rendering.
+    """
+    return pd.DataFrame(
+        {'open': o, 'high': h, 'low': l, 'close': c, 'volume': v},
+        index=pd.Index(bar_ts, dtype=np.int64, name='timestamp')
+    )
+
+def compute_ols_hedge_ratio_fast(c1, c2):
+    """
+    Calculates only the OLS hedge ratio (slope of c1 on c2) as cov / var.
+    Same slope as the statsmodels fit, without building a results object.
+    Expects aligned, NaN-free close arrays.
+    """
+    if len(c1) < 2:
+        return None
+
+    xd = c2 - c2.mean()
+    var_x = (xd * xd).sum()
+    if var_x == 0:
+        return None
+
+    return (xd * (c1 - c1.mean())).sum() / var_x
+
+def compute_ols_hedge_ratio_full(c1, c2):
+    """
+    Calculates the hedge ratio between two price series using OLS.
+    Returns the full statsmodels fit for the Statistical Tests tab.
+    Expects aligned, NaN-free close arrays.
+    """
+    if len(c1) < 2:
         return None, None
     
-    # Use 'close' prices from resampled data
-    y = aligned_df['close_1']
-    X = sm.add_constant(aligned_df['close_2'])
+    # Regress c1 on c2 (plus a constant)
+    X = sm.add_constant(c2, has_constant='add')
     
-    model = sm.OLS(y, X).fit()
-    hedge_ratio = model.params.iloc[1] # Use .iloc[1] for positional access
+    model = sm.OLS(c1, X).fit()
+    hedge_ratio = model.params[1]
     
     return hedge_ratio, model
 
-def compute_spread(df1, df2, hedge_ratio):
+def compute_spread(c1, c2, hedge_ratio):
     """
-    Calculates the spread between two series. [cite: 15]
+    Calculates the spread between two aligned close arrays. [cite: 15]
     """
-    if hedge_ratio is None:
-        return pd.Series(dtype=np.float64)
-        
-    aligned_df = df1.join(df2, how='inner', lsuffix='_1', rsuffix='_2')
-    
-    if aligned_df.empty:
-        return pd.Series(dtype=np.float64)
+    if hedge_ratio is None or len(c1) == 0:
+        return np.empty(0)
         
-    spread = aligned_df['close_1'] - hedge_ratio * aligned_df['close_2']
-    spread = spread.rename('spread')
-    return spread
+    return c1 - hedge_ratio * c2
 
-def compute_zscore(spread_series):
+def compute_zscore(spread):
     """
-    Calculates the z-score of the spread. [cite: 15]
+    Calculates the z-score of the spread array. [cite: 15]
+    Returns (zscore, mean, std); the mean/std are reused for the live z-score.
+    Returns (empty array, None, None) if the spread is too short or constant.
     """
-    if spread_series.empty or spread_series.std() == 0:
-        return pd.Series(dtype=np.float64)
-        
-    mean = spread_series.mean()
-    std = spread_series.std()
-    zscore = (spread_series - mean) / std
-    return zscore.rename('zscore')
+    zscore, mean, std = _zscore_numba(np.asarray(spread, dtype=np.float64))
+    if len(zscore) == 0:
+        return zscore, None, None
+    return zscore, mean, std
+
+# --- Numba kernels ---
+# Signatures are pinned so each kernel is compiled eagerly at import and the
+# on-disk cache (cache=True) is keyed on a stable type signature; restarts then
+# load the compiled code instead of re-running the JIT. Inputs are typed as
+# read-only so pandas' copy-on-write arrays are accepted without a copy.
+_f8_in = types.Array(float64, 1, 'A', readonly=True)
+_i8_in = types.Array(int64, 1, 'A', readonly=True)
 
-def compute_rolling_correlation(df1, df2, window=50):
+@njit(
+    types.Tuple((int64[:], float64[:], float64[:], float64[:], float64[:], float64[:]))(
+        _i8_in, _f8_in, _f8_in, int64
+    ),
+    cache=True, fastmath=True, boundscheck=False
+)
+def _ohlcv_reduce_numba(ts_ms, price, size, rule_ms):
     """
-    Computes the rolling correlation between two price series. [cite: 15]
+    Reduces sorted ticks into OHLCV bars of `rule_ms` in a single pass.
+    Returns (bar start ms, open, high, low, close, volume); empty bars are skipped.
     """
-    aligned_df = df1.join(df2, how='inner', lsuffix='_1', rsuffix='_2')
-    
-    if aligned_df.empty or len(aligned_df) < window:
-        return pd.Series(dtype=np.float64)
-        
-    return aligned_df['close_1'].rolling(window).corr(aligned_df['close_2']).rename('correlation')
+    n = len(ts_ms)
+    bar_ts = np.empty(n, dtype=np.int64)
+    o = np.empty(n)
+    h = np.empty(n)
+    l = np.empty(n)
+    c = np.empty(n)
+    v = np.empty(n)
+
+    k = -1
+    prev = 0
+    for i in range(n):
+        bucket = ts_ms[i] // rule_ms
+        p = price[i]
+        if k < 0 or bucket != prev:
+            # New bar
+            k += 1
+            prev = bucket
+            bar_ts[k] = bucket * rule_ms
+            o[k] = p
+            h[k] = p
+            l[k] = p
+            v[k] = 0.0
+        elif p > h[k]:
+            h[k] = p
+        elif p < l[k]:
+            l[k] = p
+        c[k] = p
+        v[k] += size[i]
+
+    k += 1
+    return bar_ts[:k], o[:k], h[:k], l[:k], c[:k], v[:k]
+
+@njit(types.Tuple((float64[:], float64, float64))(_f8_in), cache=True, fastmath=True, boundscheck=False)
+def _zscore_numba(spread):
+    """
+    Z-score using the sample std (ddof=1), like pandas' std().
+    Returns (zscore, mean, std), with an empty zscore if there are < 2
+    points or the std is 0.
+    """
+    n = len(spread)
+    if n < 2:
+        return np.empty(0), 0.0, 0.0
+
+    mean = 0.0
+    for i in range(n):
+        mean += spread[i]
+    mean /= n
+
+    ss = 0.0
+    for i in range(n):
+        d = spread[i] - mean
+        ss += d * d
+    std = sqrt(ss / (n - 1))
+    if std == 0.0:
+        return np.empty(0), 0.0, 0.0
+
+    out = np.empty(n)
+    for i in range(n):
+        out[i] = (spread[i] - mean) / std
+    return out, mean, std
+
+@njit(float64[:](_f8_in, _f8_in, int64), cache=True, fastmath=True, boundscheck=False)
+def _rolling_corr_numba(x, y, w):
+    """
+    Rolling Pearson correlation using running sums (O(1) update per step).
+    The first w-1 outputs are NaN, matching pandas' rolling().corr().
+    """
+    n = len(x)
+    out = np.full(n, np.nan)
+    if n < w:
+        return out
+
+    # Shift by the first value to limit cancellation in the sums of squares
+    x0 = x[0]
+    y0 = y[0]
+    s_x = 0.0
+    s_y = 0.0
+    s_xx = 0.0
+    s_yy = 0.0
+    s_xy = 0.0
+    for i in range(w):
+        xi = x[i] - x0
+        yi = y[i] - y0
+        s_x += xi
+        s_y += yi
+        s_xx += xi * xi
+        s_yy += yi * yi
+        s_xy += xi * yi
+
+    for i in range(w - 1, n):
+        if i >= w:
+            # Slide the window: add x[i], drop x[i-w]
+            xi = x[i] - x0
+            yi = y[i] - y0
+            xo = x[i - w] - x0
+            yo = y[i - w] - y0
+            s_x += xi - xo
+            s_y += yi - yo
+            s_xx += xi * xi - xo * xo
+            s_yy += yi * yi - yo * yo
+            s_xy += xi * yi - xo * yo
+
+        num = w * s_xy - s_x * s_y
+        den = (w * s_xx - s_x * s_x) * (w * s_yy - s_y * s_y)
+        if den > 0.0:
+            out[i] = num / sqrt(den)
+    return out
+
+@njit(int64[:](_f8_in, _f8_in, int64), cache=True, fastmath=True, boundscheck=False)
+def _lttb_numba(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line (x sorted).
+    Returns the indices of the `n_out` points to keep, always including
+    the first and last point.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    out = np.empty(n_out, dtype=np.int64)
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    out[0] = 0
+    for i in range(n_out - 2):
+        # Average of the next bucket is the third triangle vertex
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = 0.0
+        avg_y = 0.0
+        for j in range(avg_start, avg_end):
+            avg_x += x[j]
+            avg_y += y[j]
+        cnt = avg_end - avg_start
+        avg_x /= cnt
+        avg_y /= cnt
+
+        # Pick the point in the current bucket with the largest triangle
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        max_area = -1.0
+        max_j = start
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > max_area:
+                max_area = area
+                max_j = j
+        out[i + 1] = max_j
+        a = max_j
+
+    out[n_out - 1] = n - 1
+    return out
+
+def compute_rolling_correlation(c1, c2, window=50):
+    """
+    Computes the rolling correlation between two aligned close arrays. [cite: 15]
+    """
+    if len(c1) < window:
+        return np.empty(0)
+
+    return _rolling_corr_numba(c1, c2, window)
 
 def run_adf_test(series):
     """
@@ -143,4 +393,28 @@ def run_adf_test(series):
             'Critical Values': result[4]
         }
     except Exception as e:
-        return {"error": f"ADF test failed: {e}"}
\ No newline at end of file
+        return {"error": f"ADF test failed: {e}"}
+
+def downsample(series, max_points=2000):
+    """
+    Reduces a series indexed by epoch ms to at most `max_points` points with
+    LTTB, keeping its visual shape. Used to cap what is sent to the browser for plotting.
+    """
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+
+    x = series.index.to_numpy(dtype=np.float64)
+    y = series.to_numpy(dtype=np.float64)
+    return series.iloc[_lttb_numba(x, y, max_points)]
+
+# Warm up the kernels once at import so the first Streamlit render never
+# pays the JIT/cache-load cost.
+try:
+    _dummy = np.zeros(4, dtype=np.float64)
+    _ohlcv_reduce_numba(np.zeros(4, dtype=np.int64), _dummy, _dummy, 1000)
+    _zscore_numba(_dummy)
+    _rolling_corr_numba(_dummy, _dummy, 2)
+    _lttb_numba(_dummy, _dummy, 3)
+except Exception as e:
+    print(f"Numba warm-up failed: {e}")
\ No newline at end of file
@@ -2,12 +2,19 @@ import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
 import time
+import hashlib
+from threading import Thread, Lock
 import analytics as an # Your analytics.py file
 import sqlite3
 
 # --- Configuration ---
 DB_PATH = 'data/ticks.db'
 DEFAULT_SYMBOLS = ['BTCUSDT', 'ETHUSDT']
+MAX_ROWS = 500000 # Most recent ticks aggregated on first load per symbol
+MAX_BARS = 20000 # Bars kept in memory per symbol/timeframe
+MAX_PLOT_POINTS = 2000 # Points per chart trace after downsampling
+PIPELINE_INTERVAL = 5 # Seconds between background analytics refreshes
+PIPELINE_IDLE_TIMEOUT = 60 # Stop the background thread after this long without a rerun
 # ---------------------
 
 # --- Page Configuration ---
@@ -20,29 +27,202 @@ st.title("📈 Real-Time Quant Analytics Dashboard")
 
 # --- Helper Functions ---
 
-@st.cache_data(ttl=15) # Cache data for 15 seconds
-def load_data_from_db(symbols):
-    """Load tick data and resample."""
-    tick_data = an.load_data(DB_PATH, symbols)
-    return tick_data
+@st.cache_resource
+def get_conn():
+    """
+    Opens one shared, read-only SQLite connection that is reused across reruns.
+    check_same_thread=False because Streamlit may rerun the script on another thread.
+    """
+    conn = sqlite3.connect(f"file:{DB_PATH}", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA cache_size=-65536;") # 64 MiB page cache
+    conn.execute("PRAGMA mmap_size=268435456;") # 256 MiB memory-mapped I/O
+    # The dashboard never writes; reject any accidental writes
+    conn.execute("PRAGMA query_only=ON;")
+    return conn
 
-@st.cache_data(ttl=15)
-def get_latest_tick_data(symbols):
-    """Gets the single most recent tick for live stats."""
+@st.cache_resource
+def get_bar_store():
+    """
+    Bar cache shared by every session. It is an in-process reference (never
+    pickled), so sessions watching the same symbols/timeframe reuse each
+    other's bars instead of loading their own copy.
+    """
+    return {'lock': Lock(), 'bar_cache': {}, 'last_ts': {}}
+
+def load_data_from_db(conn, symbols, timeframe, store, max_rows=MAX_ROWS):
+    """
+    Load OHLCV bars, keeping them in the shared `store` between refreshes.
+    The first call aggregates the latest `max_rows` ticks per symbol in SQLite;
+    later calls only fetch ticks newer than the last one seen, resample them
+    and merge them into the cached bars. If more than `max_rows` ticks have
+    arrived since, the cached bars are re-seeded from the newest `max_rows`.
+    """
+    bar_cache = store['bar_cache']
+    last_ts = store['last_ts'] # Newest tick folded into each cached bar set
+
+    bars = {}
+    for sym in symbols:
+        key = (sym, timeframe)
+        try:
+            # Cached DataFrames are replaced, never mutated, so readers
+            # holding an older reference are unaffected
+            with store['lock']:
+                # An empty first load leaves last_ts at -1; load from scratch
+                # again rather than topping up from the start of the table
+                if key not in bar_cache or last_ts[key] < 0:
+                    bars_loaded, last_ts[key] = an.load_bars(conn, sym, timeframe, max_rows)
+                    bar_cache[key] = bars_loaded.iloc[-MAX_BARS:]
+                else:
+                    new_ticks = an.load_new_data(conn, sym, last_ts[key], max_rows)
+                    if len(new_ticks) >= max_rows:
+                        # Too far behind to top up (e.g. the store sat idle
+                        # for hours): re-seed from the newest ticks instead
+                        bar_cache[key] = an.resample_data(new_ticks['timestamp'], new_ticks['price'], new_ticks['size'], rule=timeframe).iloc[-MAX_BARS:]
+                        last_ts[key] = int(new_ticks['timestamp'][-1])
+                    elif len(new_ticks):
+                        new_bars = an.resample_data(new_ticks['timestamp'], new_ticks['price'], new_ticks['size'], rule=timeframe)
+                        bar_cache[key] = an.append_bars(bar_cache[key], new_bars).iloc[-MAX_BARS:]
+                        last_ts[key] = int(new_ticks['timestamp'][-1])
+        except Exception as e:
+            print(f"Error loading data for {sym}: {e}")
+        bars[sym] = bar_cache.get(key, pd.DataFrame())
+
+    return bars
+
+def get_latest_tick_data(conn, symbols):
+    """
+    Gets the single most recent tick for live stats.
+    Not cached: it's read in the pipeline alongside the bars so the live
+    z-score pairs the latest prices with the current spread moments.
+    """
     latest_ticks = {}
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("PRAGMA journal_mode=WAL;")
+        query = "SELECT timestamp, price FROM ticks WHERE symbol = ? ORDER BY timestamp DESC LIMIT 1"
         for sym in symbols:
-            query = f"SELECT timestamp, price FROM ticks WHERE symbol = '{sym}' ORDER BY timestamp DESC LIMIT 1"
-            df = pd.read_sql_query(query, conn)
-            if not df.empty:
-                latest_ticks[sym] = df.iloc[0]
-        conn.close()
+            row = conn.execute(query, (sym,)).fetchone()
+            if row is not None:
+                latest_ticks[sym] = {'timestamp': row[0], 'price': row[1]}
     except Exception as e:
         print(f"Error getting latest tick: {e}")
     return latest_ticks
 
+def compute_analytics(pipeline, params):
+    """
+    Loads new bars for the pair and runs all analytics on them.
+    Returns a result dict that the script only reads for plotting.
+    """
+    sym1, sym2, timeframe, rolling_window, show_ols_summary = params
+    bar_data = load_data_from_db(pipeline['conn'], [sym1, sym2], timeframe, pipeline['store'])
+    df1, df2 = bar_data[sym1], bar_data[sym2]
+    result = {
+        'params': params,
+        'df1': df1,
+        'df2': df2,
+        'latest_ticks': get_latest_tick_data(pipeline['conn'], [sym1, sym2]),
+    }
+    if df1.empty or df2.empty:
+        return result
+
+    # Align the two close series once and pass plain arrays to analytics
+    aligned = df1[['close']].join(df2[['close']], how='inner', lsuffix='_1', rsuffix='_2').dropna()
+    c1 = aligned['close_1'].to_numpy()
+    c2 = aligned['close_2'].to_numpy()
+    idx = aligned.index
+
+    hedge_ratio = an.compute_ols_hedge_ratio_fast(c1, c2)
+    spread_vals = an.compute_spread(c1, c2, hedge_ratio)
+    zscore_vals, spread_mean, spread_std = an.compute_zscore(spread_vals)
+    corr_vals = an.compute_rolling_correlation(c1, c2, window=rolling_window)
+
+    result.update(
+        c1=c1,
+        c2=c2,
+        hedge_ratio=hedge_ratio,
+        # Wrap back into Series only for plotting/export
+        spread=pd.Series(spread_vals, index=idx[:len(spread_vals)], name='spread'),
+        zscore=pd.Series(zscore_vals, index=idx[:len(zscore_vals)], name='zscore'),
+        rolling_corr=pd.Series(corr_vals, index=idx[:len(corr_vals)], name='correlation'),
+        # Moments of the whole spread, reused for the live z-score
+        spread_mean=spread_mean,
+        spread_std=spread_std,
+    )
+    # Full statsmodels fit only when its summary is shown
+    if show_ols_summary and hedge_ratio is not None:
+        _, ols_model = an.compute_ols_hedge_ratio_full(c1, c2)
+        result['ols_nobs'] = int(ols_model.nobs)
+        # summary() needs the omnibus test, which requires at least 8 samples
+        if ols_model.nobs >= 8:
+            result['ols_summary'] = ols_model.summary(yname=sym1, xname=['const', sym2]).as_text()
+    return result
+
+def run_pipeline(pipeline, params):
+    """
+    Runs compute_analytics and publishes the result as pipeline['latest'].
+    The result is built off to the side and swapped in under the lock, so
+    readers always see a complete result (double-buffering).
+    """
+    with pipeline['compute_lock']:
+        result = compute_analytics(pipeline, params)
+    with pipeline['lock']:
+        # Don't overwrite a newer result if the controls changed meanwhile
+        if params == pipeline['params']:
+            pipeline['latest'] = result
+    return result
+
+def _pipeline_loop(pipeline):
+    """
+    Background thread: refreshes the analytics every PIPELINE_INTERVAL
+    seconds and stops once the session has been idle for PIPELINE_IDLE_TIMEOUT.
+    """
+    while time.monotonic() - pipeline['last_seen'] < PIPELINE_IDLE_TIMEOUT:
+        try:
+            run_pipeline(pipeline, pipeline['params'])
+        except Exception as e:
+            print(f"Analytics pipeline error: {e}")
+        time.sleep(PIPELINE_INTERVAL)
+    pipeline['running'] = False
+
+def get_analytics(conn, params):
+    """
+    Returns the latest analytics result for `params`, starting this
+    session's background pipeline thread if it isn't running.
+    Computes synchronously only on the first render or after the controls change.
+    """
+    pipeline = st.session_state.get('pipeline')
+    if pipeline is None:
+        pipeline = {
+            'conn': conn,
+            'lock': Lock(), # Guards 'latest'
+            'compute_lock': Lock(), # Serializes this session's pipeline runs
+            'store': get_bar_store(),
+            'params': params,
+            'latest': None,
+            'running': False,
+        }
+        st.session_state['pipeline'] = pipeline
+
+    pipeline['params'] = params
+    pipeline['last_seen'] = time.monotonic()
+    if not pipeline['running']:
+        pipeline['running'] = True
+        Thread(target=_pipeline_loop, args=(pipeline,), daemon=True).start()
+
+    with pipeline['lock']:
+        result = pipeline['latest']
+    if result is None or result['params'] != params:
+        result = run_pipeline(pipeline, params)
+    return result
+
+@st.cache_data(show_spinner=False)
+def run_adf_test_cached(key, _spread):
+    """
+    Runs the ADF test, cached on `key` (a hash of the spread values) so
+    repeated clicks on an unchanged spread don't recompute it.
+    """
+    return an.run_adf_test(_spread)
+
 # --- Sidebar Controls [cite: 25] ---
 st.sidebar.header("Controls")
 # Note: For this assignment, we'll hardcode the symbols.
@@ -68,6 +248,8 @@ regression_type = st.sidebar.radio(
     "Regression Type",
     ['OLS'], # [cite: 15] OLS is the core req. Extensions are bonus.
 )
+# The full statsmodels fit is slow on long histories, so only run it on request
+show_ols_summary = st.sidebar.toggle("Show Full OLS Summary", value=False)
 
 # --- Alerting [cite: 19] ---
 st.sidebar.header("Alerts")
@@ -78,22 +260,20 @@ if len(symbols_to_pair) != 2:
     st.warning("Please select exactly two symbols in the sidebar to form a pair.")
 else:
     sym1, sym2 = symbols_to_pair
+    conn = get_conn()
     
-    # Load and process data
-    raw_tick_data = load_data_from_db(symbols_to_pair)
+    # Analytics run on a background thread; this just reads the latest result
+    result = get_analytics(conn, (sym1, sym2, timeframe, rolling_window, show_ols_summary))
+    df1, df2 = result['df1'], result['df2']
     
-    if raw_tick_data[sym1].empty or raw_tick_data[sym2].empty:
+    if df1.empty or df2.empty:
         st.error("Not enough data in the database. Please let the 'ingest.py' script run for a few minutes.")
     else:
-        # Resample data
-        df1 = an.resample_data(raw_tick_data[sym1], rule=timeframe)
-        df2 = an.resample_data(raw_tick_data[sym2], rule=timeframe)
-        
-        # --- Analytics Calculations ---
-        hedge_ratio, ols_model = an.compute_ols_hedge_ratio(df1, df2)
-        spread = an.compute_spread(df1, df2, hedge_ratio)
-        zscore = an.compute_zscore(spread)
-        rolling_corr = an.compute_rolling_correlation(df1, df2, window=rolling_window)
+        c1, c2 = result['c1'], result['c2']
+        hedge_ratio = result['hedge_ratio']
+        spread = result['spread']
+        zscore = result['zscore']
+        rolling_corr = result['rolling_corr']
         
         # Create tabs for different views
         tab_live, tab_pair, tab_stats, tab_export = st.tabs(
@@ -110,8 +290,10 @@ else:
             # Plotly chart for prices [cite: 16, 24]
             fig_live = go.Figure()
             # Use resampled 'close' for the main chart
-            fig_live.add_trace(go.Scatter(x=df1.index, y=df1['close'], mode='lines', name=f"{sym1} ({timeframe})"))
-            fig_live.add_trace(go.Scatter(x=df2.index, y=df2['close'], mode='lines', name=f"{sym2} ({timeframe})"))
+            close1 = an.downsample(df1['close'], MAX_PLOT_POINTS)
+            close2 = an.downsample(df2['close'], MAX_PLOT_POINTS)
+            fig_live.add_trace(go.Scattergl(x=pd.to_datetime(close1.index, unit='ms'), y=close1, mode='lines', name=f"{sym1} ({timeframe})"))
+            fig_live.add_trace(go.Scattergl(x=pd.to_datetime(close2.index, unit='ms'), y=close2, mode='lines', name=f"{sym2} ({timeframe})"))
             fig_live.update_layout(
                 title=f"{sym1} / {sym2} Prices",
                 xaxis_title="Time", 
@@ -129,12 +311,14 @@ else:
             else:
                 # Plot Spread
                 fig_spread = go.Figure()
-                fig_spread.add_trace(go.Scatter(x=spread.index, y=spread, mode='lines', name='Spread'))
+                spread_plot = an.downsample(spread, MAX_PLOT_POINTS)
+                fig_spread.add_trace(go.Scattergl(x=pd.to_datetime(spread_plot.index, unit='ms'), y=spread_plot, mode='lines', name='Spread'))
                 fig_spread.update_layout(title="Pair Spread (Price - HR * Price)", xaxis_title="Time", yaxis_title="Spread")
                 st.plotly_chart(fig_spread, width='stretch', key="spread_chart")
                 # Plot Z-Score
                 fig_zscore = go.Figure()
-                fig_zscore.add_trace(go.Scatter(x=zscore.index, y=zscore, mode='lines', name='Z-Score'))
+                zscore_plot = an.downsample(zscore, MAX_PLOT_POINTS)
+                fig_zscore.add_trace(go.Scattergl(x=pd.to_datetime(zscore_plot.index, unit='ms'), y=zscore_plot, mode='lines', name='Z-Score'))
                 # Add alert lines
                 fig_zscore.add_hline(y=z_alert_threshold, line_dash="dash", line_color="red", annotation_text="Alert Level")
                 fig_zscore.add_hline(y=-z_alert_threshold, line_dash="dash", line_color="red")
@@ -146,7 +330,8 @@ else:
                 st.warning("Could not compute rolling correlation. Not enough data for window size.")
             else:
                 fig_corr = go.Figure()
-                fig_corr.add_trace(go.Scatter(x=rolling_corr.index, y=rolling_corr, mode='lines', name='Rolling Correlation'))
+                corr_plot = an.downsample(rolling_corr, MAX_PLOT_POINTS)
+                fig_corr.add_trace(go.Scattergl(x=pd.to_datetime(corr_plot.index, unit='ms'), y=corr_plot, mode='lines', name='Rolling Correlation'))
                 fig_corr.update_layout(title=f"{rolling_window}-Period Rolling Correlation", xaxis_title="Time", yaxis_title="Correlation")
                 st.plotly_chart(fig_corr, width='stretch', key="corr_chart")
 
@@ -155,22 +340,24 @@ else:
             st.header("Cointegration & Stationarity Tests")
             st.subheader("OLS Regression Results")
             st.subheader("OLS Regression Results")
-            if ols_model:
+            if hedge_ratio is None:
+                st.warning("Could not compute OLS model.")
+            else:
                 st.text(f"Hedge Ratio (Slope): {hedge_ratio:.6f}")
-
-                # Check if there are enough data points for the omni_normtest
-                if ols_model.nobs < 8:
-                    st.warning(f"Not enough data ({int(ols_model.nobs)} samples) for a full statistical summary (like omnitest).")
-                    st.text("Please let 'ingest.py' run for longer or choose a smaller timeframe.")
+                if not show_ols_summary:
+                    st.info("Enable 'Show Full OLS Summary' in the sidebar to run the full regression.")
+                # The fit itself runs in the analytics pipeline
+                elif 'ols_summary' in result:
+                    st.text(result['ols_summary'])
                 else:
-                    st.text(ols_model.summary())
-            else:
-                st.warning("Could not compute OLS model.")
+                    st.warning(f"Not enough data ({result['ols_nobs']} samples) for a full statistical summary (like omnitest).")
+                    st.text("Please let 'ingest.py' run for longer or choose a smaller timeframe.")
                 
             st.subheader("Augmented Dickey-Fuller (ADF) Test on Spread [cite: 15]")
             if st.button("Run ADF Test on Spread"):
                 if not spread.empty:
-                    adf_results = an.run_adf_test(spread)
+                    spread_key = hashlib.blake2b(spread.to_numpy().tobytes(), digest_size=16).digest()
+                    adf_results = run_adf_test_cached(spread_key, spread)
                     st.json(adf_results)
                     if adf_results.get('p-value') is not None:
                         if adf_results['p-value'] < 0.05:
@@ -192,6 +379,8 @@ else:
                 "zscore": zscore,
                 "rolling_corr": rolling_corr
             }).dropna()
+            # Bars are indexed by epoch ms; convert for the export only
+            export_df.index = pd.to_datetime(export_df.index, unit='ms', cache=True)
             
             st.dataframe(export_df.tail())
             
@@ -207,18 +396,20 @@ else:
 )
 
         # --- Live Update Loop ---
-        # This loop will rerun the whole script, but @st.cache_data
-        # prevents reloading all the data every second.
+        # This loop will rerun the whole script, but loading and analytics
+        # happen on the background pipeline thread; a rerun only reads its result.
         
-        latest_ticks = get_latest_tick_data(symbols_to_pair)
+        latest_ticks = result['latest_ticks']
         
         # Calculate live z-score
         live_z = "N/A"
         alert_triggered = False
         
-        if sym1 in latest_ticks and sym2 in latest_ticks and hedge_ratio is not None and not spread.empty:
+        spread_mean, spread_std = result['spread_mean'], result['spread_std']
+        
+        if sym1 in latest_ticks and sym2 in latest_ticks and spread_std is not None:
             live_spread = latest_ticks[sym1]['price'] - hedge_ratio * latest_ticks[sym2]['price']
-            live_z_val = (live_spread - spread.mean()) / spread.std()
+            live_z_val = (live_spread - spread_mean) / spread_std
             live_z = f"{live_z_val:.4f}"
             
             if abs(live_z_val) > z_alert_threshold:
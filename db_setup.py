@@ -25,6 +25,12 @@ try:
         PRIMARY KEY (timestamp, symbol)
     )
     ''')
+
+    # Index for the dashboard's "latest N ticks per symbol" queries,
+    # so they become an index range scan instead of a full table scan.
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_sym_ts ON ticks (symbol, timestamp DESC)
+    ''')
     
     conn.commit()
     print(f"Database '{DB_PATH}' and table 'ticks' created successfully.")
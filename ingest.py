@@ -1,118 +1,148 @@
-import websocket
-import json
+import asyncio
+import websockets
+import orjson
 import sqlite3
-import time
-from threading import Thread
-from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 SYMBOLS = ["btcusdt", "ethusdt"] # Symbols from the assignment
 DB_PATH = 'data/ticks.db'
+WS_URL = "wss://fstream.binance.com/ws/{symbol}@trade"
+MAX_BATCH = 500 # Max ticks written per transaction
+BATCH_TIMEOUT = 0.2 # Max seconds spent filling a batch
 # ---------------------
 
-# A thread-safe queue to hold messages from websockets
-data_queue = Queue()
-
 def get_db_connection():
     """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH, timeout=10)
+    # isolation_level=None: no implicit transactions, the writer issues BEGIN/COMMIT itself
+    conn = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
     # Enable Write-Ahead Logging (WAL) for concurrent access
     conn.execute("PRAGMA journal_mode=WAL;")
+    # WAL makes synchronous=NORMAL safe: commits no longer wait on fsync
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA cache_size=-65536;") # 64 MiB page cache
+    conn.execute("PRAGMA mmap_size=268435456;") # 256 MiB memory-mapped I/O
+    conn.execute("PRAGMA wal_autocheckpoint=1000;") # Cap WAL growth (pages)
     return conn
 
-def database_writer():
+def commit_batch(conn, batch):
+    """
+    Writes a batch of (ts, symbol, price, size) rows in a single transaction.
+    Runs on the DB executor thread, since sqlite3 calls block.
+    """
+    try:
+        # BEGIN IMMEDIATE takes the write lock up front instead of
+        # upgrading mid-transaction. OR IGNORE skips duplicate ticks
+        # (same timestamp/symbol) instead of aborting the whole batch.
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT OR IGNORE INTO ticks (timestamp, symbol, price, size) VALUES (?, ?, ?, ?)",
+            batch
+        )
+        conn.execute("COMMIT")
+        
+        _, symbol, price, _ = batch[-1]
+        print(f"Logged: {len(batch)} ticks (last: {symbol} @ {price})")
+
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"DB Writer Error: {e}")
+
+async def database_writer(queue):
     """
-    A dedicated thread that pulls data from the queue and writes to the DB.
+    The single consumer: pulls ticks from the queue and writes them to the DB
+    in batches (one transaction per batch, so one fsync per batch).
+    The sqlite3 work runs on a dedicated one-thread executor so the event loop
+    keeps reading websockets while a batch is being committed.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    print("--- Database writer thread started. ---")
+    loop = asyncio.get_running_loop()
+    # One worker: the connection is created and only ever used on that thread
+    db_pool = ThreadPoolExecutor(max_workers=1)
+    conn = await loop.run_in_executor(db_pool, get_db_connection)
+    print("--- Database writer started. ---")
 
     while True:
-        try:
-            # Get data from the queue (this will block until data is available)
-            trade_data = data_queue.get()
+        # Wait until at least one tick is available
+        batch = [await queue.get()]
+        deadline = loop.time() + BATCH_TIMEOUT
 
-            # Insert into database
-            cursor.execute(
-                "INSERT INTO ticks (timestamp, symbol, price, size) VALUES (?, ?, ?, ?)",
-                (trade_data['ts'], trade_data['symbol'], trade_data['price'], trade_data['size'])
-            )
-            conn.commit()
-            
-            print(f"Logged: {trade_data['symbol']} @ {trade_data['price']}")
+        # Keep draining the queue until the batch is full or the timeout expires
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
 
-        except sqlite3.IntegrityError:
-            # This is expected if a tick with the same timestamp/symbol arrives
-            pass
-        except Exception as e:
-            print(f"DB Writer Error: {e}")
-        finally:
-            # Mark the task as done
-            data_queue.task_done()
+        await loop.run_in_executor(db_pool, commit_batch, conn, batch)
 
-def on_message(ws, message):
+def parse_message(message):
     """
-    Callback function to process incoming WebSocket messages.
-    This function should be very fast: parse JSON, add to queue.
+    Parses a WebSocket message into a (ts, symbol, price, size) row.
+    Returns None for anything that isn't a trade event.
+    This function should be very fast: it runs for every message.
     """
     try:
-        data = json.loads(message)
+        data = orjson.loads(message)
         
         # Check if it's a trade event
         if data.get('e') == 'trade':
             # Normalize data
-            trade_data = {
-                'ts': data['T'],      # Event time (timestamp)
-                'symbol': data['s'],
-                'price': float(data['p']),
-                'size': float(data['q'])
-            }
-            # Put the data into the queue for the writer thread
-            data_queue.put(trade_data)
+            return (
+                data['T'],      # Event time (timestamp)
+                data['s'],
+                float(data['p']),
+                float(data['q'])
+            )
             
     except Exception as e:
         print(f"Error processing message: {e}\nMessage: {message}")
+    return None
 
-def on_error(ws, error):
-    print(f"WS Error: {error}")
+async def stream(symbol, queue, delay=0):
+    """
+    Streams trades for one symbol into the queue, reconnecting on errors.
+    """
+    await asyncio.sleep(delay) # Stagger connections slightly
+    url = WS_URL.format(symbol=symbol.lower())
 
-def on_close(ws, close_status_code, close_msg):
-    print(f"--- WS Closed (Code: {close_status_code}) --- Retrying in 5s...")
-    time.sleep(5)
-    start_websocket(ws.symbol) # Simple reconnect logic
+    while True:
+        print(f"Attempting to connect to: {symbol}")
+        try:
+            async with websockets.connect(url) as ws:
+                print(f"--- WS Connected: {symbol} ---")
+                async for message in ws:
+                    trade = parse_message(message)
+                    if trade is not None:
+                        # Unbounded queue: never blocks the reader
+                        queue.put_nowait(trade)
+        except Exception as e:
+            print(f"WS Error ({symbol}): {e}")
 
-def on_open(ws):
-    print(f"--- WS Connected: {ws.symbol} ---")
-    
-def start_websocket(symbol):
-    """Starts a WebSocket connection for a given symbol."""
-    print(f"Attempting to connect to: {symbol}")
-    url = f"wss://fstream.binance.com/ws/{symbol.lower()}@trade"
-    ws = websocket.WebSocketApp(url,
-                              on_open=on_open,
-                              on_message=on_message,
-                              on_error=on_error,
-                              on_close=on_close)
-    ws.symbol = symbol # Attach symbol to ws object for reconnects
-    ws.run_forever()
+        print(f"--- WS Closed ({symbol}) --- Retrying in 5s...")
+        await asyncio.sleep(5) # Simple reconnect logic
+
+async def main():
+    """
+    Runs every symbol's stream and the database writer on one event loop.
+    """
+    queue = asyncio.Queue()
+    await asyncio.gather(
+        database_writer(queue),
+        *(stream(sym, queue, delay=i) for i, sym in enumerate(SYMBOLS))
+    )
 
 if __name__ == "__main__":
     print(f"Starting data ingestion for symbols: {', '.join(SYMBOLS)}...")
     print(f"Storing data in: {DB_PATH}")
 
-    # Start the single database writer thread
-    # daemon=True means it will close when the main program exits
-    db_thread = Thread(target=database_writer, daemon=True)
-    db_thread.start()
-
-    # Start a separate thread for each symbol's WebSocket connection
-    ws_threads = []
-    for sym in SYMBOLS:
-        thread = Thread(target=start_websocket, args=(sym,))
-        thread.start()
-        ws_threads.append(thread)
-        time.sleep(1) # Stagger connections slightly
-
-    for t in ws_threads:
-        t.join()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file